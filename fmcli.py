@@ -33,6 +33,10 @@ units_tib = units('T', 'TiB', 2 ** 40)
 
 units_auto = units('a', 'auto', None)
 
+# Scales that the automatic units choose from
+number_scale = [units_none, units_k, units_m, units_g, units_t]
+size_scale = [units_bytes, units_kib, units_mib, units_gib, units_tib]
+
 def format_size(units, num):
 	'''Pretty-format a number with base-2 suffixes.'''
 	if num is None:
@@ -42,11 +46,10 @@ def format_size(units, num):
 			return "{:,}{}{}".format(int(num), \
 				' ' if len(units.label) > 0 else '', units.label[:-1] if num == 1 else units.label)
 		return "{:,.1f} {}".format(float(num) / units.factor, units.label)
-	units_scale = [units_bytes, units_kib, units_mib, units_gib, units_tib]
-	for i in range(0, len(units_scale) - 1):
-		if num < units_scale[i + 1].factor:
-			return format_size(units_scale[i], num)
-	return format_size(units_scale[-1], num)
+	for i in range(0, len(size_scale) - 1):
+		if num < size_scale[i + 1].factor:
+			return format_size(size_scale[i], num)
+	return format_size(size_scale[-1], num)
 
 def format_number(units, num):
 	'''Pretty-format a number with base-10 suffixes.'''
@@ -57,11 +60,10 @@ def format_number(units, num):
 			return "{:,}{}{}".format(int(num), \
 				' ' if len(units.label) > 0 else '', units.label)
 		return "{:,.1f} {}".format(float(num) / units.factor, units.label)
-	units_scale = [units_none, units_k, units_m, units_g, units_t]
-	for i in range(0, len(units_scale) - 1):
-		if num < units_scale[i + 1].factor:
-			return format_number(units_scale[i], num)
-	return format_number(units_scale[-1], num)
+	for i in range(0, len(number_scale) - 1):
+		if num < number_scale[i + 1].factor:
+			return format_number(number_scale[i], num)
+	return format_number(number_scale[-1], num)
 
 def posix_timestamp_str(dt, pretty = False):
 	'''Generate a string from a datetime object.'''
@@ -73,24 +75,35 @@ def posix_timestamp_str(dt, pretty = False):
 	dt = dt.astimezone(fmdb.tz_gmt)
 	return dt.isoformat()
 
-def n2p(maximum, num):
-	'''Convert a suffixed number to an integer.'''
-	conv = [
+def suffix_table(conv):
+	'''Map lowercase unit suffixes to units; earlier units win.'''
+	ret = {}
+	for unit in conv:
+		if len(unit.abbrev) > 0:
+			ret.setdefault(unit.abbrev.lower(), unit)
+	return ret
+
+def suffixed_to_int(conv, num):
+	'''Convert a suffixed quantity to an integer.'''
+	unit = conv.get(num[-1].lower())
+	if unit is not None:
+		return int(unit.factor * float(num[:-1]))
+	return int(num)
+
+def number_units(maximum):
+	'''Suffix table for numbers.'''
+	return suffix_table([
 		units('%', 'percent', maximum / 100.0),
 		units_none,
 		units_k,
 		units_m,
 		units_g,
 		units_t,
-	]
-	for unit in conv:
-		if num[-1].lower() == unit.abbrev.lower():
-			return int(unit.factor * float(num[:-1]))
-	return int(num)
+	])
 
-def s2p(fs, num):
-	'''Convert a suffixed size to an integer.'''
-	conv = [
+def size_units(fs):
+	'''Suffix table for sizes on a given filesystem.'''
+	return suffix_table([
 		units('%', 'percent', fs.total_bytes / 100.0),
 		units('B', 'blocks', fs.block_size),
 		units_bytes,
@@ -99,11 +112,15 @@ def s2p(fs, num):
 		units_mib,
 		units_gib,
 		units_tib,
-	]
-	for unit in conv:
-		if num[-1].lower() == unit.abbrev.lower():
-			return int(unit.factor * float(num[:-1]))
-	return int(num)
+	])
+
+def n2p(maximum, num):
+	'''Convert a suffixed number to an integer.'''
+	return suffixed_to_int(number_units(maximum), num)
+
+def s2p(fs, num):
+	'''Convert a suffixed size to an integer.'''
+	return suffixed_to_int(size_units(fs), num)
 
 def parse_ranges(args, fn):
 	'''Parse string arguments into numeric ranges.'''
@@ -111,15 +128,15 @@ def parse_ranges(args, fn):
 	if 'all' in args:
 		return ranges
 	for arg in args:
-		if ':' in arg:
-			pos = arg.index(':')
-			ranges.append((fn(arg[:pos]), fn(arg[pos+1:])))
-		elif '-' in arg:
-			start = 1 if arg[0] == '-' else 0
-			pos = arg.index('-', start)
-			ranges.append((fn(arg[:pos]), fn(arg[pos+1:])))
-		else:
+		# Split at the first ':', or else at the first '-' that
+		# isn't a leading minus sign; each is a single scan.
+		pos = arg.find(':')
+		if pos < 0:
+			pos = arg.find('-', 1)
+		if pos < 0:
 			ranges.append(fn(arg))
+		else:
+			ranges.append((fn(arg[:pos]), fn(arg[pos+1:])))
 	return ranges
 
 def split_unescape(s, delim, str_delim, escape='\\', unescape=True):
@@ -135,6 +152,9 @@ def split_unescape(s, delim, str_delim, escape='\\', unescape=True):
 	>>> split_unescape('foo$', ',', '$', unescape=True)
 	['foo$']
 	"""
+	# Nothing quoted or escaped?  Let str.split do the work.
+	if escape not in s and not any(d in s for d in str_delim):
+		return [x for x in s.split(delim) if len(x) > 0]
 	ret = []
 	current = []
 	in_str = False
@@ -252,11 +272,13 @@ class fmcli(code.InteractiveConsole):
 
 	def parse_size_ranges(self, args):
 		'''Parse string arguments into size ranges.'''
-		return parse_ranges(args, lambda x: s2p(self.fs, x))
+		conv = size_units(self.fs)
+		return parse_ranges(args, lambda x: suffixed_to_int(conv, x))
 
 	def parse_number_ranges(self, args, maximum):
 		'''Parse string arguments into number ranges.'''
-		return parse_ranges(args, lambda x: n2p(maximum, x))
+		conv = number_units(maximum)
+		return parse_ranges(args, lambda x: suffixed_to_int(conv, x))
 
 	## Pretty printers
 
@@ -10,6 +10,8 @@ import stat
 import array
 import fiemap
 import math
+import itertools
+import functools
 import compdb
 import vfs
 from collections import namedtuple
@@ -18,9 +20,14 @@ from dateutil import tz
 
 # Debugging stuff
 def print_times(label, times):
-	'''Print some profiling data.'''
-	l = ['%0.2fs' % (times[i] - times[i - 1]).total_seconds() for i in range(1, len(times))]
-	print('%s: %.02fs (%s)' % (label, (times[-1] - times[0]).total_seconds(), ', '.join(l)))
+	'''Print some profiling data.  Times are datetimes or
+	   time.perf_counter() values.'''
+	def secs(d):
+		if isinstance(d, datetime.timedelta):
+			return d.total_seconds()
+		return d
+	l = ['%0.2fs' % secs(times[i] - times[i - 1]) for i in range(1, len(times))]
+	print('%s: %.02fs (%s)' % (label, secs(times[-1] - times[0]), ', '.join(l)))
 
 def print_sql(qstr, qarg = None):
 	'''Print some debug stuff.'''
@@ -177,8 +184,10 @@ extent_flags_long = {
 extent_flags_strings = {extent_flags[i]: i for i in extent_flags}
 extent_flags_strings_long = {extent_flags_long[i]: i for i in extent_flags_long}
 
+@functools.lru_cache(maxsize = 1024)
 def extent_flags_to_str(flags):
-	'''Convert an extent flags number into a string.'''
+	'''Convert an extent flags number into a string.  Only a few
+	   combinations of flags ever show up, so remember them.'''
 	return ''.join([extent_flags[f] for f in extent_flags if flags & f > 0])
 
 def extent_str_to_flags(string):
@@ -373,58 +382,129 @@ class overview_block(object):
 		return scale_colors(colorinfo)
 
 	def to_letter(ov):
-		def on(t):
-			return ov.ets is None or t in ov.ets
 		'''Render this overview block as a string.'''
-		tot = ov.files + ov.dirs + ov.mappings + ov.metadata + ov.xattrs + ov.symlinks + ov.freesp
-		if tot == 0:
-			return '.'
-		elif ov.files == tot and on(EXT_TYPE_FILE):
-			return 'F'
-		elif ov.dirs == tot and on(EXT_TYPE_DIR):
-			return 'D'
-		elif ov.mappings == tot and on(EXT_TYPE_EXTENT):
-			return 'E'
-		elif ov.metadata == tot and on(EXT_TYPE_METADATA):
-			return 'M'
-		elif ov.xattrs == tot and on(EXT_TYPE_XATTR):
-			return 'X'
-		elif ov.symlinks == tot and on(EXT_TYPE_SYMLINK):
-			return 'S'
-		elif ov.freesp == tot and on(EXT_TYPE_FREESP):
-			return 'U'
-
-		x = 0
-		if ov.files > x and on(EXT_TYPE_FILE):
-			x = ov.files
-			letter = 'f'
-		if ov.dirs > x and on(EXT_TYPE_DIR):
-			x = ov.dirs
-			letter = 'd'
-		if ov.mappings > x and on(EXT_TYPE_EXTENT):
-			x = ov.mappings
-			letter = 'e'
-		if ov.metadata > x and on(EXT_TYPE_METADATA):
-			x = ov.metadata
-			letter = 'm'
-		if ov.xattrs > x and on(EXT_TYPE_XATTR):
-			x = ov.xattrs
-			letter = 'x'
-		if ov.symlinks > x and on(EXT_TYPE_SYMLINK):
-			x = ov.symlinks
-			letter = 's'
-		if ov.freesp > x and on(EXT_TYPE_FREESP):
-			x = ov.freesp
-			letter = 'u'
-		if x == 0:
-			letter = '.'
-		return letter
+		return overview_letter(ov.counts(), overview_letter_table(ov.ets))
+
+	def counts(ov):
+		'''Return the extent counts in overview_fields order.'''
+		return [ov.files, ov.dirs, ov.mappings, ov.metadata, ov.xattrs, \
+			ov.symlinks, ov.freesp]
 
 	def __str__(ov):
 		return '(f:%d d:%d e:%d m:%d x:%d s:%d u:%d)' % (ov.files, \
 				ov.dirs, ov.mappings, ov.metadata, ov.xattrs, \
 				ov.symlinks, ov.freesp)
 
+overview_fields = ['files', 'dirs', 'mappings', 'metadata', 'xattrs', \
+		   'symlinks', 'freesp']
+
+# Extent type and letters for each overview field
+overview_letters = [
+	(EXT_TYPE_FILE,		'F', 'f'),
+	(EXT_TYPE_DIR,		'D', 'd'),
+	(EXT_TYPE_EXTENT,	'E', 'e'),
+	(EXT_TYPE_METADATA,	'M', 'm'),
+	(EXT_TYPE_XATTR,	'X', 'x'),
+	(EXT_TYPE_SYMLINK,	'S', 's'),
+	(EXT_TYPE_FREESP,	'U', 'u'),
+]
+
+def overview_letter_table(extents_to_show):
+	'''Precompute (field index, all-of-cell letter, most-of-cell letter)
+	   for each extent type being shown.'''
+	return [(i, u, l) for i, (t, u, l) in enumerate(overview_letters) \
+			if extents_to_show is None or t in extents_to_show]
+
+def overview_letter(counts, table):
+	'''Pick the overview letter for a cell's extent counts.'''
+	tot = sum(counts)
+	if tot == 0:
+		return '.'
+	x = 0
+	letter = '.'
+	for i, upper, lower in table:
+		c = counts[i]
+		if c == tot:
+			return upper
+		if c > x:
+			x = c
+			letter = lower
+	return letter
+
+def overview_cell_letters(cells, table):
+	'''Pick the overview letters for a sequence of cells' extent
+	   counts in a single loop.  Empty and fully used cells tend to
+	   repeat the same counts, so remember each answer.'''
+	letters = []
+	append = letters.append
+	seen = {}
+	for counts in cells:
+		letter = seen.get(counts)
+		if letter is not None:
+			append(letter)
+			continue
+		tot = sum(counts)
+		letter = '.'
+		if tot > 0:
+			x = 0
+			for i, upper, lower in table:
+				c = counts[i]
+				if c == tot:
+					letter = upper
+					break
+				if c > x:
+					x = c
+					letter = lower
+		seen[counts] = letter
+		append(letter)
+	return letters
+
+def overview_cell_colors(cells, bgcolor, userdatacolor, filemetacolor, \
+			 fsmetacolor, freespcolor):
+	'''Pick the heatmap colors (as HTML strings) for a sequence of
+	   cells' extent counts.  This mixes colors the same way as
+	   overview_block.to_color, without making color objects, and
+	   remembers the color for counts that it has already seen.'''
+	squares = [(c.red * c.red, c.green * c.green, c.blue * c.blue) for c in \
+			[userdatacolor, filemetacolor, fsmetacolor, freespcolor]]
+	bg = bgcolor.html()
+	colors = []
+	append = colors.append
+	seen = {}
+	sqrt = math.sqrt
+	for counts in cells:
+		html = seen.get(counts)
+		if html is not None:
+			append(html)
+			continue
+		files, dirs, mappings, metadata, xattrs, symlinks, freesp = counts
+		parts = (files + xattrs, dirs + mappings + symlinks, metadata, freesp)
+		tot = parts[0] + parts[1] + parts[2] + parts[3]
+		if tot == 0:
+			html = bg
+		else:
+			red = green = blue = 0
+			for (r, g, b), n in zip(squares, parts):
+				p = n / tot
+				red += r * p
+				green += g * p
+				blue += b * p
+			html = '#%02x%02x%02x' % (int(clamp(sqrt(red), 0, 255)), \
+					int(clamp(sqrt(green), 0, 255)), \
+					int(clamp(sqrt(blue), 0, 255)))
+		seen[counts] = html
+		append(html)
+	return colors
+
+def overview_prefix_sums(counts):
+	'''Compute running totals of each overview field from a list of
+	   per-cell count tuples, so that the sum over cells [x, y) is
+	   sums[f][y] - sums[f][x].'''
+	sums = [array.array('q', [0]) for f in overview_fields]
+	for a, column in zip(sums, zip(*counts)):
+		a.extend(itertools.accumulate(column))
+	return sums
+
 ## Main database object
 #
 # Manage FM data.  That means handling the overview, updating data,
@@ -715,6 +795,11 @@ class fmdb(object):
 
 	def query_overview(self):
 		'''Generate an overview report.'''
+		for r in self.query_overview_counts():
+			yield overview_block(self.extent_types_to_show, *r)
+
+	def query_overview_counts(self):
+		'''Generate an overview report as tuples of extent counts.'''
 		cur = self.conn.cursor()
 		cur.arraysize = self.result_batch_size
 
@@ -732,17 +817,14 @@ class fmdb(object):
 				if len(rows) == 0:
 					break
 				for r in rows:
-					yield overview_block(self.extent_types_to_show, \
-							r[0], r[1], \
-							r[2], r[3], r[4], \
-							r[5], r[6])
+					yield r
 			t1 = datetime.datetime.today()
 			print_times('cached_overview', [t0, t1])
 			return
 
 		# Generate and cache it, then.
-		for row in self.cache_overview(self.overview_len):
-			yield row
+		for ov in self.cache_overview(self.overview_len):
+			yield ov.counts()
 
 	def pick_cells(self, ranges):
 		'''Convert ranges of cells to ranges of bytes.'''
@@ -760,10 +842,14 @@ class fmdb(object):
 					raise ValueError("range %d outside of overview" % i[1])
 				yield (i[0] * sbc, (i[1] + 1) * sbc - 1)
 
-	def pick_bytes(self, ranges):
-		'''Convert ranges of bytes to ranges of cells.'''
-		sbc = self.bytes_per_cell
+	def pick_bytes(self, ranges, overview_len = None):
+		'''Convert ranges of bytes to ranges of cells, either of the
+		   current overview or of an overview of the given length.'''
 		self.query_summary()
+		if overview_len is None:
+			sbc = self.bytes_per_cell
+		else:
+			sbc = int(float(self.fs.total_bytes) / overview_len)
 
 		for i in ranges:
 			if type(i) == int:
@@ -1110,6 +1196,22 @@ class fmdb(object):
 			for row in rows:
 				yield dentry(row[0], row[1], row[2])
 
+	def query_dir(self, dir_ino):
+		'''Query the directory entries of a single directory inode,
+		   sorted by name with subdirectories first.'''
+		cur = self.conn.cursor()
+		cur.arraysize = self.result_batch_size
+		qstr = 'SELECT name, name_ino, type FROM dentry_t WHERE dir_ino = ? ORDER BY type != ?, name'
+		qarg = [dir_ino, INO_TYPE_DIR]
+		print_sql(qstr, qarg)
+		cur.execute(qstr, qarg)
+		while True:
+			rows = cur.fetchmany()
+			if len(rows) == 0:
+				break
+			for row in rows:
+				yield dentry(row[0], row[1], row[2])
+
 	## Query inode features
 
 	def __query_inode_range_sql(self, ranges, mode, field):
@@ -1417,13 +1519,17 @@ class fmdb(object):
 		qstr = 'SELECT path, ino, p_off, l_off, length, flags, type FROM path_extent_v %s ORDER BY ino, l_off' % isql
 		print_sql(qstr, qarg)
 		cur.execute(qstr, qarg)
-		upd = []
+		# Rows come out grouped by inode, so a file's extents can all
+		# share one path string instead of each holding a copy.
+		path = None
 		while True:
 			rows = cur.fetchmany()
 			if len(rows) == 0:
 				break
 			for row in rows:
-				yield extent(row[0], row[1], row[2], row[3], \
+				if row[0] != path:
+					path = row[0]
+				yield extent(path, row[1], row[2], row[3], \
 						row[4], row[5], row[6])
 		t2 = datetime.datetime.now()
 		print_times('query_extents', [t0, t1, t2])
@@ -13,11 +13,17 @@ except:
 	print("Loading qt4...")
 import fmcli
 import datetime
+import time
 import fmdb
 import math
 import os.path
 import json
 import base64
+import itertools
+import array
+import functools
+import collections
+import operator
 from abc import ABCMeta, abstractmethod
 import dateutil.parser
 
@@ -45,30 +51,40 @@ def addReturnPressedEvents(widget):
 	m = ReturnKeyEater(widget)
 	widget.installEventFilter(m)
 
-def sort_dentry(dentry):
-	if dentry.type == fmdb.INO_TYPE_DIR:
-		return '0' + dentry.name
-	else:
-		return '1' + dentry.name
+def size_table_columns(table, model):
+	'''Size a table's columns to fit the headers and some typical
+	   cell text, without asking the model for every row.'''
+	fm = table.fontMetrics()
+	hfm = table.header().fontMetrics()
+	for col in range(len(model.headers)):
+		w = max(hfm.width(model.headers[col]), \
+			fm.width(model.column_samples[col]))
+		table.setColumnWidth(col, w + 16)
 
 class MessagePump(object):
 	'''Helper class to prime the Qt message queue periodically.'''
 	def __init__(self, on_fn, off_fn):
 		self.last = None
 		self.interval = None
-		self.i_start = datetime.timedelta(seconds = 1)
-		self.i_run = datetime.timedelta(milliseconds = 50)
+		self.i_start = 1.0
+		self.i_run = 0.05
 		self.on_fn = on_fn
 		self.off_fn = off_fn
 
 	def start(self):
 		'''Set ourselves up for periodic message pumping.'''
-		self.last = datetime.datetime.today()
+		self.last = time.perf_counter()
 		self.interval = self.i_start
 
 	def pump(self):
 		'''Actually pump messages.'''
-		now = datetime.datetime.today()
+		# Tables keep pulling rows from their queries after the
+		# query itself has finished; there's nothing to pump then.
+		if self.last is None:
+			return
+		# This runs for every few rows a query returns, so use the
+		# cheap monotonic clock instead of building datetimes.
+		now = time.perf_counter()
 		if now > self.last + self.interval:
 			if self.interval == self.i_start:
 				self.on_fn()
@@ -82,30 +98,116 @@ class MessagePump(object):
 		self.last = None
 		self.interval = None
 
+class LazyList(list):
+	'''A list that pulls its contents from an iterator on demand.
+	   len() only counts the items fetched so far.'''
+	def __init__(self, iterable = (), yield_fn = None, batch_size = 1000):
+		if isinstance(iterable, list):
+			super(LazyList, self).__init__(iterable)
+			self.it = None
+		else:
+			super(LazyList, self).__init__()
+			self.it = iter(iterable)
+		self.yield_fn = yield_fn
+		self.batch_size = batch_size
+
+	def fetch(self, nr = None):
+		'''Pull up to nr more items (or everything) from the iterator.'''
+		start = len(self)
+		while self.it is not None and (nr is None or len(self) - start < nr):
+			want = self.batch_size
+			if nr is not None:
+				want = min(want, nr - (len(self) - start))
+			batch = list(itertools.islice(self.it, want))
+			self.extend(batch)
+			if len(batch) < want:
+				self.it = None
+			elif self.yield_fn is not None:
+				self.yield_fn()
+		return len(self) - start
+
+	def is_complete(self):
+		'''Have we pulled everything out of the iterator?'''
+		return self.it is None
+
+	def __iter__(self):
+		i = 0
+		while i < len(self) or self.fetch(self.batch_size) > 0:
+			yield self[i]
+			i += 1
+
+	def sort(self, *args, **kwargs):
+		self.fetch()
+		super(LazyList, self).sort(*args, **kwargs)
+
+class RowSorter(object):
+	'''Sort table rows.  Each column's sort keys are computed once
+	   and then reordered along with the rows, so sorting the same
+	   rows by another column (or in reverse) doesn't recompute them.
+	   Every sort is stable with respect to the current order.'''
+	def __init__(self, sort_keys):
+		self.sort_keys = sort_keys
+		self.reset()
+
+	def reset(self):
+		'''Forget the keys; call this when the rows change.'''
+		self.keys = {}
+
+	def sort(self, rows, column, reverse = False):
+		'''Sort rows into a new LazyList, and say where each old
+		   row went.'''
+		keys = self.keys.get(column)
+		if keys is None:
+			keys = [self.sort_keys[column](r) for r in rows]
+			self.keys[column] = keys
+		order = sorted(range(len(keys)), key = keys.__getitem__, \
+				reverse = reverse)
+		for c, keys in self.keys.items():
+			self.keys[c] = [keys[i] for i in order]
+		where = [0] * len(order)
+		for new, old in enumerate(order):
+			where[old] = new
+		return (LazyList([rows[i] for i in order]), where)
+
 ## Data models
 
+extent_table_roles = frozenset([QtCore.Qt.DisplayRole, QtCore.Qt.FontRole, \
+			       QtCore.Qt.TextAlignmentRole])
+
 class ExtentTableModel(QtCore.QAbstractTableModel):
 	'''Render and highlight an extent table.'''
 	def __init__(self, fs, data, units, rows_to_show=500, parent=None, *args):
 		super(ExtentTableModel, self).__init__(parent, *args)
-		self.__data = data
+		self.__data = LazyList(data)
 		self.headers = ['Physical Offset', 'Logical Offset', \
 				'Length', 'Flags', 'Type', 'Path']
 		self.header_map = [
 			lambda x: fmcli.format_size(self.units, x.p_off),
 			lambda x: fmcli.format_size(self.units, x.l_off),
 			lambda x: fmcli.format_size(self.units, x.length),
-			lambda x: fmdb.extent_flagstr(x),
-			lambda x: fmdb.extent_typestr(x),
+			fmdb.extent_flagstr,
+			fmdb.extent_typestr,
 			lambda x: x.path if x.path != '' else fs.pathsep
 		]
+		# attrgetter pulls the plain fields out without calling
+		# back into Python for every row.
 		self.sort_keys = [
-			lambda x: x.p_off,
+			operator.attrgetter('p_off'),
 			lambda x: -1 if x.l_off is None else x.l_off,
-			lambda x: x.length,
-			lambda x: fmdb.extent_flagstr(x),
-			lambda x: fmdb.extent_typestr(x),
-			lambda x: x.path,
+			operator.attrgetter('length'),
+			fmdb.extent_flagstr,
+			fmdb.extent_typestr,
+			operator.attrgetter('path'),
+		]
+		self.sorter = RowSorter(self.sort_keys)
+		# Typical wide cell text, for sizing the columns.
+		self.column_samples = [
+			'1,023.9 GiB',
+			'1,023.9 GiB',
+			'1,023.9 GiB',
+			'',
+			'Extended Attribute',
+			'',
 		]
 		self.align_map = [
 			QtCore.Qt.AlignRight,
@@ -119,42 +221,75 @@ class ExtentTableModel(QtCore.QAbstractTableModel):
 		self.rows_to_show = rows_to_show
 		self.rows = min(rows_to_show, len(data))
 		self.name_highlight = None
+		# Formatted strings for the rows shown so far, one list per
+		# column; None for rows that haven't been drawn yet
+		self.columns = [[] for h in self.headers]
+		# Which of the first few rows are highlighted
+		self.bold_rows = bytearray()
+		self.fonts_changed = False
 
 	def change_units(self, new_units):
 		'''Change the display units of the size and length columns.'''
 		self.units = new_units
+		# Only the size columns need reformatting; do that as the
+		# rows are drawn again.
+		for j in range(0, 3):
+			self.columns[j] = []
 		tl = self.createIndex(0, 0)
 		br = self.createIndex(len(self.__data) - 1, 2)
 		self.dataChanged.emit(tl, br)
 
 	def revise(self, new_data):
 		'''Update the extent table and redraw.'''
+		if not isinstance(new_data, LazyList):
+			new_data = LazyList(new_data)
+		new_data.fetch(self.rows_to_show)
+		self.sorter.reset()
 		olen = self.rows
 		nlen = min(len(new_data), self.rows_to_show)
-		self.rows = nlen
-		parent = self.createIndex(-1, -1)
-		self.layoutAboutToBeChanged.emit()
-		if olen > nlen:
-			self.beginRemoveRows(parent, nlen, olen)
-		elif nlen > olen:
-			self.beginInsertRows(parent, olen, nlen)
+		# If the rows on display are a prefix of the new results
+		# (or vice versa), only the tail needs to change.
+		k = 0
+		while k < min(olen, nlen) and self.__data[k] == new_data[k]:
+			k += 1
+		for col in self.columns:
+			del col[k:]
+		del self.bold_rows[k:]
+		if k < min(olen, nlen):
+			self.beginResetModel()
+			self.__data = new_data
+			self.rows = nlen
+			self.fonts_changed = False
+			self.endResetModel()
+			return
+		if nlen > olen:
+			self.beginInsertRows(null_model, olen, nlen - 1)
+		elif olen > nlen:
+			self.beginRemoveRows(null_model, nlen, olen - 1)
 		self.__data = new_data
-		if olen > nlen:
-			self.endRemoveRows()
-		elif nlen > olen:
+		self.rows = nlen
+		if nlen > olen:
 			self.endInsertRows()
-		tl = self.createIndex(0, 0)
-		br = self.createIndex(olen - 1, len(self.headers) - 1)
-		self.dataChanged.emit(tl, br)
-		self.layoutChanged.emit()
+		elif olen > nlen:
+			self.endRemoveRows()
+		# Only repaint the kept rows if the highlighted names changed.
+		if k > 0 and self.fonts_changed:
+			tl = self.createIndex(0, 0)
+			br = self.createIndex(k - 1, len(self.headers) - 1)
+			self.dataChanged.emit(tl, br)
+		self.fonts_changed = False
 
 	def canFetchMore(self, parent):
-		return self.rows < len(self.__data)
+		return self.rows < len(self.__data) or \
+		       not self.__data.is_complete()
 
 	def fetchMore(self, parent):
 		'''Reduce load times by rendering subsets selectively.'''
+		self.__data.fetch(self.rows + self.rows_to_show - len(self.__data))
 		nlen = min(len(self.__data) - self.rows, self.rows_to_show)
-		self.beginInsertRows(parent, self.rows, self.rows + nlen)
+		if nlen <= 0:
+			return
+		self.beginInsertRows(parent, self.rows, self.rows + nlen - 1)
 		self.rows += nlen
 		self.endInsertRows()
 
@@ -167,24 +302,43 @@ class ExtentTableModel(QtCore.QAbstractTableModel):
 		return len(self.headers)
 
 	def data(self, index, role):
-		def is_name_highlighted(name):
-			if self.name_highlight is None:
-				return False
-			return name in self.name_highlight
-		if not index.isValid():
+		# The view asks for a dozen roles per cell and we only
+		# answer three, so turn the rest away before anything else.
+		if role not in extent_table_roles or not index.isValid():
 			return None
 		i = index.row()
-		j = index.column()
-		row = self.__data[i]
 		if role == QtCore.Qt.DisplayRole:
-			return self.header_map[j](row)
+			col = self.columns[index.column()]
+			if i >= len(col) or col[i] is None:
+				self.format_rows(i)
+			return col[i]
 		elif role == QtCore.Qt.FontRole:
-			if is_name_highlighted(row.path):
-				return bold_font
-			return None
-		elif role == QtCore.Qt.TextAlignmentRole:
-			return self.align_map[j]
-		return None
+			if i >= len(self.bold_rows):
+				self.mark_bold_rows(i + 1)
+			return bold_font if self.bold_rows[i] else None
+		return self.align_map[index.column()]
+
+	def format_rows(self, i):
+		'''Format the block of rows_to_show rows around row i, a
+		   column at a time.'''
+		start = i - i % self.rows_to_show
+		rows = self.__data[start:start + self.rows_to_show]
+		end = start + len(rows)
+		for col, f in zip(self.columns, self.header_map):
+			if len(col) < end:
+				col.extend([None] * (end - len(col)))
+			col[start:end] = [f(x) for x in rows]
+
+	def mark_bold_rows(self, n):
+		'''Decide which of the rows shown so far (and at least the
+		   first n rows) are highlighted.'''
+		start = len(self.bold_rows)
+		rows = self.__data[start:max(n, self.rows)]
+		names = self.name_highlight
+		if names:
+			self.bold_rows.extend([x.path in names for x in rows])
+		else:
+			self.bold_rows.extend(bytes(len(rows)))
 
 	def headerData(self, col, orientation, role):
 		if orientation == QtCore.Qt.Horizontal and \
@@ -194,9 +348,18 @@ class ExtentTableModel(QtCore.QAbstractTableModel):
 
 	def highlight_names(self, names = None):
 		'''Highlight rows corresponding to some FS paths.'''
+		names = None if names is None else frozenset(names)
+		if names == self.name_highlight:
+			return
 		self.name_highlight = names
+		self.bold_rows = bytearray()
+		self.fonts_changed = True
 		# Skip the re-render since we're just about to requery anyway.
 
+	def is_complete(self):
+		'''Have all the query results been loaded?'''
+		return self.__data.is_complete()
+
 	def extents(self, rows):
 		'''Retrieve a range of extents.'''
 		if rows is None or len(rows) == 0:
@@ -215,22 +378,39 @@ class ExtentTableModel(QtCore.QAbstractTableModel):
 				yield r
 
 	def extent_count(self):
-		'''Return the number of rows in the dataset.'''
+		'''Return the number of rows loaded so far.'''
 		return len(self.__data)
 
 	def sort(self, column, order):
 		if column < 0:
 			return
-		self.__data.sort(key = self.sort_keys[column], reverse = order == 1)
-		tl = self.createIndex(0, 0)
-		br = self.createIndex(self.rows - 1, len(self.headers) - 1)
-		self.dataChanged.emit(tl, br)
+		# Pull in the rest of the results before telling the view
+		# that the layout is changing, so the sort itself doesn't
+		# go back to the query.
+		self.__data.fetch()
+		self.layoutAboutToBeChanged.emit()
+		# Sort a copy; the query cache may still hold the original.
+		self.__data, where = self.sorter.sort(self.__data, column, \
+				order == 1)
+		self.columns = [[] for h in self.headers]
+		self.bold_rows = bytearray()
+		self.move_persistent_indexes(where)
+		self.layoutChanged.emit()
+
+	def move_persistent_indexes(self, where):
+		'''Point the view's indexes (and selection) at the rows'
+		   new positions.'''
+		old = self.persistentIndexList()
+		new = [self.createIndex(where[i.row()], i.column()) \
+				if where[i.row()] < self.rows else null_model \
+				for i in old]
+		self.changePersistentIndexList(old, new)
 
 class InodeTableModel(QtCore.QAbstractTableModel):
 	'''Render and highlight an inode table.'''
 	def __init__(self, fs, data, units, rows_to_show=500, parent=None, *args):
 		super(InodeTableModel, self).__init__(parent, *args)
-		self.__data = data
+		self.__data = LazyList(data)
 		self.fs = fs
 		self.headers = ['Inode', 'Extents', \
 				'Travel Score', 'Type', 'Size', 'Last Access', \
@@ -240,7 +420,7 @@ class InodeTableModel(QtCore.QAbstractTableModel):
 			lambda x: fmcli.format_number(fmcli.units_none, x.ino),
 			lambda x: fmcli.format_number(fmcli.units_none, x.nr_extents),
 			lambda x: fmcli.format_size(self.units, x.travel_score),
-			lambda x: fmdb.inode_typestr(x),
+			fmdb.inode_typestr,
 			lambda x: fmcli.format_size(self.units, x.size),
 			lambda x: fmcli.posix_timestamp_str(x.atime, True),
 			lambda x: fmcli.posix_timestamp_str(x.crtime, True),
@@ -249,16 +429,30 @@ class InodeTableModel(QtCore.QAbstractTableModel):
 			lambda x: self.fs.pathsep if x.path == '' else x.path,
 		]
 		self.sort_keys = [
-			lambda x: x.ino,
+			operator.attrgetter('ino'),
 			lambda x: -1 if x.nr_extents is None else x.nr_extents,
 			lambda x: -1 if x.travel_score is None else x.travel_score,
-			lambda x: fmdb.inode_typestr(x),
+			fmdb.inode_typestr,
 			lambda x: -1 if x.size is None else x.size,
 			lambda x: -1 if x.atime is None else x.atime,
 			lambda x: -1 if x.crtime is None else x.crtime,
 			lambda x: -1 if x.ctime is None else x.ctime,
 			lambda x: -1 if x.mtime is None else x.mtime,
-			lambda x: x.path,
+			operator.attrgetter('path'),
+		]
+		self.sorter = RowSorter(self.sort_keys)
+		# Typical wide cell text, for sizing the columns.
+		self.column_samples = [
+			'999,999,999',
+			'999,999',
+			'1,023.9 GiB',
+			'Symbolic Link',
+			'1,023.9 GiB',
+			'31-Dec-2099 23:59:59',
+			'31-Dec-2099 23:59:59',
+			'31-Dec-2099 23:59:59',
+			'31-Dec-2099 23:59:59',
+			'',
 		]
 		self.align_map = [
 			QtCore.Qt.AlignRight,
@@ -286,32 +480,28 @@ class InodeTableModel(QtCore.QAbstractTableModel):
 
 	def revise(self, new_data):
 		'''Update the inode table and redraw.'''
-		olen = self.rows
-		nlen = min(len(new_data), self.rows_to_show)
-		self.rows = nlen
-		parent = self.createIndex(-1, -1)
-		self.layoutAboutToBeChanged.emit()
-		if olen > nlen:
-			self.beginRemoveRows(parent, nlen, olen)
-		elif nlen > olen:
-			self.beginInsertRows(parent, olen, nlen)
+		if not isinstance(new_data, LazyList):
+			new_data = LazyList(new_data)
+		new_data.fetch(self.rows_to_show)
+		self.sorter.reset()
+		# The whole table is replaced, so one reset is cheaper than
+		# row insertions followed by a full repaint.
+		self.beginResetModel()
 		self.__data = new_data
-		if olen > nlen:
-			self.endRemoveRows()
-		elif nlen > olen:
-			self.endInsertRows()
-		tl = self.createIndex(0, 0)
-		br = self.createIndex(olen - 1, len(self.headers) - 1)
-		self.dataChanged.emit(tl, br)
-		self.layoutChanged.emit()
+		self.rows = min(len(new_data), self.rows_to_show)
+		self.endResetModel()
 
 	def canFetchMore(self, parent):
-		return self.rows < len(self.__data)
+		return self.rows < len(self.__data) or \
+		       not self.__data.is_complete()
 
 	def fetchMore(self, parent):
 		'''Reduce load times by rendering subsets selectively.'''
+		self.__data.fetch(self.rows + self.rows_to_show - len(self.__data))
 		nlen = min(len(self.__data) - self.rows, self.rows_to_show)
-		self.beginInsertRows(parent, self.rows, self.rows + nlen)
+		if nlen <= 0:
+			return
+		self.beginInsertRows(parent, self.rows, self.rows + nlen - 1)
 		self.rows += nlen
 		self.endInsertRows()
 
@@ -324,10 +514,6 @@ class InodeTableModel(QtCore.QAbstractTableModel):
 		return len(self.headers)
 
 	def data(self, index, role):
-		def is_name_highlighted(name):
-			if self.name_highlight is None:
-				return False
-			return name in self.name_highlight
 		if not index.isValid():
 			return None
 		i = index.row()
@@ -336,7 +522,7 @@ class InodeTableModel(QtCore.QAbstractTableModel):
 		if role == QtCore.Qt.DisplayRole:
 			return self.header_map[j](row)
 		elif role == QtCore.Qt.FontRole:
-			if is_name_highlighted(row.path):
+			if self.name_highlight and row.path in self.name_highlight:
 				return bold_font
 			return None
 		elif role == QtCore.Qt.TextAlignmentRole:
@@ -351,7 +537,7 @@ class InodeTableModel(QtCore.QAbstractTableModel):
 
 	def highlight_names(self, names = None):
 		'''Highlight rows corresponding to some FS paths.'''
-		self.name_highlight = names
+		self.name_highlight = None if names is None else frozenset(names)
 		# Skip the re-render since we're just about to requery anyway.
 		# XXX: are we?
 
@@ -365,25 +551,47 @@ class InodeTableModel(QtCore.QAbstractTableModel):
 			yield self.__data[r]
 
 	def inode_count(self):
-		'''Return the number of rows in the dataset.'''
+		'''Return the number of rows loaded so far.'''
 		return len(self.__data)
 
+	def is_complete(self):
+		'''Have all the query results been loaded?'''
+		return self.__data.is_complete()
+
 	def sort(self, column, order):
 		if column < 0:
 			return
-		self.__data.sort(key = self.sort_keys[column], reverse = order == 1)
-		tl = self.createIndex(0, 0)
-		br = self.createIndex(self.rows - 1, len(self.headers) - 1)
-		self.dataChanged.emit(tl, br)
+		# Pull in the rest of the results before telling the view
+		# that the layout is changing, so the sort itself doesn't
+		# go back to the query.
+		self.__data.fetch()
+		self.layoutAboutToBeChanged.emit()
+		self.__data, where = self.sorter.sort(self.__data, column, \
+				order == 1)
+		self.move_persistent_indexes(where)
+		self.layoutChanged.emit()
+
+	def move_persistent_indexes(self, where):
+		'''Point the view's indexes (and selection) at the rows'
+		   new positions.'''
+		old = self.persistentIndexList()
+		new = [self.createIndex(where[i.row()], i.column()) \
+				if where[i.row()] < self.rows else null_model \
+				for i in old]
+		self.changePersistentIndexList(old, new)
 
 class FsTreeNode(object):
 	'''A node in the recorded filesystem.'''
-	def __init__(self, path, ino, type, load_fn = None, parent = None, fs = None):
+	# Big trees have a lot of these, so skip the per-node dict.
+	__slots__ = ['name', 'type', 'ino', 'parent', 'load_fn', 'fs', \
+		     'loaded', 'children', 'dentries', '__row']
+
+	def __init__(self, name, ino, type, load_fn = None, parent = None, fs = None, row = 0):
 		if load_fn is None and parent is None:
 			raise ValueError('Supply a dentry loading function or a parent node.')
 		if fs is None and parent is None:
 			raise ValueError('Supply a FS summary object or a parent node.')
-		self.path = path
+		self.name = name
 		self.type = type
 		self.ino = ino
 		self.parent = parent
@@ -397,24 +605,69 @@ class FsTreeNode(object):
 			self.fs = parent.fs
 		self.loaded = False
 		self.children = None
-		self.__row = None
+		self.dentries = None
+		self.__row = row
 		if self.type != fmdb.INO_TYPE_DIR:
 			self.loaded = True
-			self.children = []
+			self.children = ()
 
-	def load(self):
-		'''Query the database for child nodes.'''
+	def load(self, nr = None):
+		'''Query the database for (up to nr) child nodes.'''
 		if self.loaded:
 			return
 		self.loaded = True
-		self.children = [FsTreeNode(self.path + self.fs.pathsep + de.name, de.ino, de.type, parent = self) for de in self.load_fn(self.path)]
+		self.children = []
+		self.dentries = iter(self.load_fn(self.ino))
+		self.add_children(self.fetch_dentries(nr))
+
+	def fetch_dentries(self, nr = None):
+		'''Pull up to nr more directory entries from the database.'''
+		if self.dentries is None:
+			return []
+		ret = list(itertools.islice(self.dentries, nr))
+		if nr is None or len(ret) < nr:
+			self.dentries = None
+		return ret
+
+	def add_children(self, dentries):
+		'''Create child nodes for some directory entries.'''
+		n = len(self.children)
+		# Names like 'Makefile' recur all over a tree, so share them.
+		self.children.extend(FsTreeNode(sys.intern(de.name), de.ino, de.type, parent = self, row = n + i) for i, de in enumerate(dentries))
+
+	def full_path(self):
+		'''Reconstruct the path to this node from its ancestors' names.'''
+		names = []
+		node = self
+		while node is not None:
+			names.append(node.name)
+			node = node.parent
+		return self.fs.pathsep.join(reversed(names))
+
+	def can_load_more(self):
+		'''Decide if there are more child nodes to load.'''
+		return self.dentries is not None
+
+	def unload(self):
+		'''Forget the child nodes; they'll be fetched again on demand.'''
+		if self.type != fmdb.INO_TYPE_DIR:
+			return
+		# Stay loaded with no rows and a fresh listing, so that the
+		# model adds the rows back through fetchMore() rather than
+		# having them reappear without an insert.
+		self.children = []
+		self.dentries = iter(self.load_fn(self.ino))
+
+	def is_ancestor_of(self, node):
+		'''Decide if a node is somewhere underneath this one.'''
+		node = node.parent
+		while node is not None:
+			if node is self:
+				return True
+			node = node.parent
+		return False
 
 	def row(self):
-		if self.__row is None:
-			if self.parent is None:
-				self.__row = 0
-			else:
-				self.__row = self.parent.children.index(self)
 		return self.__row
 
 	def hasChildren(self):
@@ -422,17 +675,21 @@ class FsTreeNode(object):
 
 class FsTreeModel(QtCore.QAbstractItemModel):
 	'''Model the filesystem tree recorded in the database.'''
-	def __init__(self, fs, root, parent=None, *args):
+	def __init__(self, fs, root, rows_to_show=500, parent=None, *args):
 		super(FsTreeModel, self).__init__(parent, *args)
 		self.root = root
 		self.headers = ['Name']
 		self.fs = fs
+		self.rows_to_show = rows_to_show
+		# Look up the theme icons once, not on every paint.
+		self.dir_icon = QtGui.QIcon.fromTheme('folder')
+		self.file_icon = QtGui.QIcon.fromTheme('text-x-generic')
 
 	def index(self, row, column, parent):
 		if not parent.isValid():
 			return self.createIndex(row, column, self.root)
 		parent = parent.internalPointer()
-		parent.load()
+		parent.load(self.rows_to_show)
 		return self.createIndex(row, column, parent.children[row])
 
 	def root_index(self):
@@ -459,9 +716,34 @@ class FsTreeModel(QtCore.QAbstractItemModel):
 		if not parent.isValid():
 			return 1
 		node = parent.internalPointer()
-		node.load()
+		node.load(self.rows_to_show)
 		return len(node.children)
 
+	def canFetchMore(self, parent):
+		if not parent.isValid():
+			return False
+		return parent.internalPointer().can_load_more()
+
+	def fetchMore(self, parent):
+		'''Reduce load times by loading big directories in pieces.'''
+		node = parent.internalPointer()
+		dentries = node.fetch_dentries(self.rows_to_show)
+		if len(dentries) == 0:
+			return
+		n = len(node.children)
+		self.beginInsertRows(parent, n, n + len(dentries) - 1)
+		node.add_children(dentries)
+		self.endInsertRows()
+
+	def unload(self, index):
+		'''Free the nodes underneath a (collapsed) directory.'''
+		node = index.internalPointer()
+		if not node.loaded or len(node.children) == 0:
+			return
+		self.beginRemoveRows(index, 0, len(node.children) - 1)
+		node.unload()
+		self.endRemoveRows()
+
 	def columnCount(self, parent):
 		return len(self.headers)
 
@@ -470,19 +752,17 @@ class FsTreeModel(QtCore.QAbstractItemModel):
 			return None
 		node = index.internalPointer()
 		if role == QtCore.Qt.DisplayRole:
-			node.load()
 			if index.column() == 0:
-				if len(node.path) == 0:
+				if node.parent is None:
 					return self.fs.pathsep
-				r = node.path.rindex(self.fs.pathsep)
-				return node.path[r + 1:]
+				return node.name
 			else:
 				return node.ino
 		elif role == QtCore.Qt.DecorationRole:
 			if node.type == fmdb.INO_TYPE_DIR:
-				return QtGui.QIcon.fromTheme('folder')
+				return self.dir_icon
 			else:
-				return QtGui.QIcon.fromTheme('text-x-generic')
+				return self.file_icon
 		return None
 
 	def headerData(self, col, orientation, role):
@@ -504,26 +784,24 @@ class ChecklistModel(QtCore.QAbstractTableModel):
 		return 1
 
 	def data(self, index, role):
-		i = index.row()
-		j = index.column()
-		if j != 0:
+		if index.column() != 0:
 			return None
 		if role == QtCore.Qt.DisplayRole:
-			return self.rows[i][0]
+			return self.rows[index.row()][0]
 		elif role == QtCore.Qt.CheckStateRole:
-			return QtCore.Qt.Checked if self.rows[i][1] else QtCore.Qt.Unchecked
-		else:
-			return None
+			return QtCore.Qt.Checked if self.rows[index.row()][1] else QtCore.Qt.Unchecked
+		return None
 
 	def flags(self, index):
 		return super(ChecklistModel, self).flags(index) | QtCore.Qt.ItemIsUserCheckable
 
 	def setData(self, index, value, role):
 		if role != QtCore.Qt.CheckStateRole:
-			return None
+			return False
 		row = index.row()
 		# N.B. Weird comparison because Python2 returns QVariant, not bool
 		self.rows[row][1] = not (value == False)
+		self.dataChanged.emit(index, index)
 		return True
 
 	def items(self):
@@ -539,17 +817,32 @@ class OverviewModel(QtCore.QObject):
 		self.fs = self.fmdb.query_summary()
 		self.ctl = ctl
 		self.ctl.resizeEvent = self.resize_ctl
+		# The overview is regenerated, never edited, so don't keep
+		# undo history for it.
+		self.ctl.setUndoRedoEnabled(False)
 		self.length = None
 		self.zoom = 1.0
 		self.precision = precision
-		self.overview_big = None
+		self.overview_sums = None
+		self.big_length = None
 		self.rst = QtCore.QTimer()
-		self.rst.timeout.connect(self.delayed_resize)
+		self.rst.setSingleShot(True)
+		self.rst.timeout.connect(self.delayed_render)
 		self.range_highlight = None
+		self.highlight_sums = None
+		self.highlight_key = None
+		self.highlight_cache = collections.OrderedDict()
+		self.highlight_cache_size = 8
 		self.yield_fn = yield_fn
 		self.auto_size = True
 		self.has_rendered = False
 		self.heatmap = True
+		self.viewport_wh = None
+		self.font_wh = None
+		self.render_key = None
+		self.cell_cache = None
+		self.heat_styles = None
+		self.letters_cache = None
 
 		self.resize_viewport()
 
@@ -557,8 +850,16 @@ class OverviewModel(QtCore.QObject):
 		'''Query the DB for the high-res overview data.'''
 		olen = min(self.precision, self.fs.total_bytes // self.fs.block_size)
 		self.fmdb.set_overview_length(olen)
-		self.overview_big = [ov for ov in self.fmdb.query_overview()]
+		counts = list(self.fmdb.query_overview_counts())
+		self.big_length = len(counts)
+		self.overview_sums = fmdb.overview_prefix_sums(counts)
 		self.has_rendered = False
+		self.render_key = None
+		self.cell_cache = None
+		self.heat_styles = None
+		self.letters_cache = None
+		self.highlight_key = None
+		self.highlight_cache.clear()
 
 	def set_zoom(self, zoom):
 		'''Set the zoom factor for the overview.'''
@@ -582,7 +883,7 @@ class OverviewModel(QtCore.QObject):
 		self.zoom = new_zoom
 		self.length = new_length
 		self.resize_viewport()
-		self.render()
+		self.schedule_render()
 
 	def total_length(self):
 		'''The total length of the overview.'''
@@ -590,16 +891,8 @@ class OverviewModel(QtCore.QObject):
 
 	def render_html(self, length):
 		'''Render the overview for a given length.'''
-		def is_highlighted(cell):
-			if range_highlight is None:
-				return False
-			for start, end in range_highlight:
-				if cell >= start and cell <= end:
-					return True
-			return False
-
-		t0 = datetime.datetime.today()
-		if self.overview_big is None:
+		t0 = time.perf_counter()
+		if self.overview_sums is None:
 			return None
 		bgcolor = fmdb.color(255, 255, 255)
 		userdatacolor = fmdb.color(255,  99,  71)
@@ -607,56 +900,91 @@ class OverviewModel(QtCore.QObject):
 		fsmetacolor = fmdb.color(136, 206, 255)
 		freespcolor = fmdb.color(238, 245, 255)
 		olen = int(length)
-		o2s = float(len(self.overview_big)) / olen
 		ov_str = []
-		t1 = datetime.datetime.today()
-		old_style_str = None
-		for i in range(0, olen):
-			x = int(round(i * o2s))
-			y = int(round((i + 1) * o2s))
-			ss = self.overview_big[x:y]
-			rh = self.range_highlight[x:y] if self.range_highlight is not None else [0]
-			ovs = fmdb.overview_block(self.fmdb.get_extent_types_to_show())
-			for s in ss:
-				ovs.add(s)
-			if sum(rh) > 0:
-				style_str = 'background: #e0e0e0; font-weight: bold;'
-			else:
-				if self.heatmap:
-					color = ovs.to_color(bgcolor, \
+		t1 = time.perf_counter()
+		ets = self.fmdb.get_extent_types_to_show()
+		letters = fmdb.overview_letter_table(ets)
+		# The cell totals only depend on the length, so keep them
+		# around for re-renders that only change the highlighting,
+		# extent types, or heatmap.
+		if self.cell_cache is None or self.cell_cache[0] != olen:
+			# Cell i covers [i * n / olen, (i + 1) * n / olen) of
+			# the high-res overview, rounded half up in integer math.
+			n = self.big_length
+			bounds = [(2 * i * n + olen) // (2 * olen) for i in range(0, olen + 1)]
+			# Aggregate one field at a time over every cell.  Pick
+			# out the running totals at the cell boundaries and
+			# subtract neighbors; itemgetter and map() keep both
+			# loops out of the interpreter.
+			at_bounds = operator.itemgetter(*bounds)
+			columns = []
+			for s in self.overview_sums:
+				ends = at_bounds(s)
+				columns.append(map(operator.sub, ends[1:], ends))
+			self.cell_cache = (olen, at_bounds, list(zip(*columns)))
+			self.heat_styles = None
+			self.letters_cache = None
+		olen, at_bounds, cells = self.cell_cache
+		# Likewise the letters only change with the extent types.
+		letters_key = None if ets is None else frozenset(ets)
+		if self.letters_cache is None or self.letters_cache[0] != letters_key:
+			self.letters_cache = (letters_key, \
+				fmdb.overview_cell_letters(cells, letters))
+		cell_letters = self.letters_cache[1]
+		if self.heatmap:
+			if self.heat_styles is None:
+				self.heat_styles = ['background: %s;' % c for c in \
+					fmdb.overview_cell_colors(cells, bgcolor, \
 						userdatacolor, filemetacolor, \
-						fsmetacolor, freespcolor)
-				else:
-					color = None
-				if color is None:
-					style_str = None
-				else:
-					style_str = 'background: %s;' % (color.html())
-			if old_style_str != style_str:
-				if old_style_str is not None:
-					ov_str.append('</span>')
-				if style_str is not None:
-					ov_str.append('<span style="%s">' % style_str)
-			ov_str.append(ovs.to_letter())
-			old_style_str = style_str
-		if old_style_str is not None:
-			ov_str.append('</span>')
-		t2 = datetime.datetime.today()
+						fsmetacolor, freespcolor)]
+			styles = list(self.heat_styles)
+		else:
+			styles = [None] * olen
+		hs = self.highlight_sums
+		if hs is not None:
+			ends = at_bounds(hs)
+			lit = map(operator.lt, ends, ends[1:])
+			for k in itertools.compress(range(olen), lit):
+				styles[k] = 'background: #e0e0e0; font-weight: bold;'
+		# Emit each run of identically styled cells as one string.
+		x = 0
+		for style_str, run in itertools.groupby(styles):
+			y = x + sum(1 for s in run)
+			text = ''.join(cell_letters[x:y])
+			if style_str is None:
+				ov_str.append(text)
+			else:
+				ov_str.append('<span style="%s">%s</span>' % (style_str, text))
+			x = y
+		t2 = time.perf_counter()
 		fmdb.print_times('render', [t0, t1, t2])
 		return ''.join(ov_str)
 
 	def render(self):
 		'''Render the overview into the text view.'''
-		html = self.render_html(int(self.length * self.zoom))
+		# Don't redo the same rendering if nothing changed.
+		length = int(self.length * self.zoom)
+		key = (length, self.heatmap, \
+		       tuple(sorted(self.fmdb.get_extent_types_to_show())))
+		if self.has_rendered and key == self.render_key:
+			return
+		html = self.render_html(length)
 		if html is None:
 			return
+		self.render_key = key
 		cursor = self.ctl.textCursor()
 		start = cursor.selectionStart()
 		end = cursor.selectionEnd()
 		vs = self.ctl.verticalScrollBar()
 		old_v = vs.value()
 		old_max = vs.maximum()
-		self.ctl.setText(html)
+		# Replacing the text fires the text, cursor, and selection
+		# signals; nobody needs those for a re-render.
+		self.ctl.blockSignals(True)
+		try:
+			self.ctl.setText(html)
+		finally:
+			self.ctl.blockSignals(False)
 		if old_max > 0:
 			if vs.maximum() == old_max:
 				vs.setValue(old_v)
@@ -669,60 +997,115 @@ class OverviewModel(QtCore.QObject):
 		'''Handle the resizing of the text view control.'''
 		QtWidgets.QTextEdit.resizeEvent(self.ctl, event)
 		if self.resize_viewport():
-			self.rst.start(40)
+			self.schedule_render()
 
 	def font_changed(self):
 		'''Call this if the font changes.'''
+		self.font_wh = None
 		if self.resize_viewport():
-			self.render()
+			self.schedule_render()
 
 	def resize_viewport(self):
 		'''Recalculate the overview size.'''
 		sz = self.ctl.viewport().size()
-		qfm = QtGui.QFontMetrics(self.ctl.document().defaultFont())
-		overview_font_width = qfm.width('M')
-		overview_font_height = qfm.height()
+		# Measure the font only when it changes, not on every resize.
+		if self.font_wh is None:
+			qfm = QtGui.QFontMetrics(self.ctl.document().defaultFont())
+			self.font_wh = (qfm.width('M'), qfm.height())
+		overview_font_width, overview_font_height = self.font_wh
 		# Cheat with the textedit width/height -- use one less
 		# column than we probably could, and force wrapping at
 		# that column.
 		w = (sz.width() // overview_font_width)
 		h = (sz.height() // overview_font_height) - 1
 		#print("overview: %d x %d vs. %d x %d" % (sz.width(), sz.height(), overview_font_width, overview_font_height))
-		self.ctl.setLineWrapColumnOrWidth(w)
+		# Setting the wrap column relays out the whole document,
+		# even if it's the same as before.
+		if w != self.ctl.lineWrapColumnOrWidth():
+			self.ctl.setLineWrapColumnOrWidth(w)
 		#print("overview; %f x %f = %f" % (w, h, w * h))
 		if self.auto_size:
 			self.length = w * h
+		# Don't bother re-rendering if the cell grid didn't change.
+		if self.has_rendered and self.viewport_wh == (w, h):
+			return False
+		self.viewport_wh = (w, h)
 		return self.auto_size or not self.has_rendered
 
-	def delayed_resize(self):
-		self.rst.stop()
+	def schedule_render(self):
+		'''Render the overview once things settle down.  Every
+		   call restarts the timer, so a burst of changes is
+		   rendered only once.'''
+		self.rst.start(40)
+
+	@QtCore.pyqtSlot()
+	def delayed_render(self):
 		self.render()
 
-	def highlight_ranges(self, ranges):
-		'''Highlight a range of physical extents in the overview.'''
-		old_highlight = self.range_highlight
-		# Figure out which ranges we're playing with
-		olen = min(self.precision, self.fs.total_bytes // self.fs.block_size)
-		self.fmdb.set_overview_length(olen)
+	def highlight_cells(self, ranges):
+		'''Map ranges of physical extents onto the cells of the
+		   high-res overview.  Returns a 0/1 byte per cell and the
+		   running count of highlighted cells.'''
+		# Map onto the cells of the high-res overview that we loaded;
+		# there's no need to change the database's overview length.
+		olen = self.big_length
 
-		# Compress that into a set
-		rset = set()
+		# Sort the cell ranges and merge the overlapping ones
+		cells = []
 		n = 0
-		for x in self.fmdb.pick_bytes(ranges):
+		for x in self.fmdb.pick_bytes(ranges, olen):
 			if type(x) == int:
-				start = end = x
+				cells.append((x, x))
 			else:
-				start, end = x
-			for x in range(start, end + 1):
-				rset.add(x)
+				cells.append(x)
 			if n > 1000:
 				self.yield_fn()
 				n = 0
 			n += 1
-		self.range_highlight =  [(1 if n in rset else 0) for n in range(0, olen)]
-		if old_highlight == self.range_highlight:
+		cells.sort()
+		runs = []
+		for start, end in cells:
+			if len(runs) > 0 and start <= runs[-1][1] + 1:
+				if end > runs[-1][1]:
+					runs[-1][1] = end
+			else:
+				runs.append([start, end])
+
+		# Mark where each run starts and stops; the running total
+		# is then 1 inside a run and 0 outside, which fits in a
+		# byte per cell and compares with a single memcmp.
+		marks = [0] * (olen + 1)
+		for start, end in runs:
+			if start >= olen:
+				break
+			marks[start] += 1
+			marks[min(end + 1, olen)] -= 1
+		mask = bytearray(itertools.accumulate(marks[:olen]))
+		# Running count of highlighted cells, so that render can
+		# check a span of cells with one subtraction.
+		sums = array.array('q', [0])
+		sums.extend(itertools.accumulate(mask))
+		return (mask, sums)
+
+	def highlight_ranges(self, ranges):
+		'''Highlight a range of physical extents in the overview.'''
+		# Re-picking the same extents changes nothing, and flipping
+		# back to a recent pick can reuse its cells.
+		key = (self.big_length, tuple(ranges))
+		if key == self.highlight_key:
 			return
-		self.render()
+		hl = self.highlight_cache.pop(key, None)
+		if hl is None:
+			hl = self.highlight_cells(key[1])
+		self.highlight_cache[key] = hl
+		while len(self.highlight_cache) > self.highlight_cache_size:
+			self.highlight_cache.popitem(last = False)
+		self.highlight_key = key
+		if hl[0] == self.range_highlight:
+			return
+		self.range_highlight, self.highlight_sums = hl
+		self.render_key = None
+		self.schedule_render()
 
 ## Query classes
 
@@ -770,6 +1153,9 @@ class FmQuery(object):
 
 class StringQuery(FmQuery):
 	'''Handle queries that are free-form text.'''
+	# Only this much history is saved, so only keep this much.
+	history_size = 100
+
 	def __init__(self, label, ctl, query_fn, edit_string = '', history = None, parent=None, *args):
 		super(StringQuery, self).__init__(label, ctl, query_fn)
 		if history is None:
@@ -779,8 +1165,16 @@ class StringQuery(FmQuery):
 		self.edit_string = edit_string
 
 	def load_query(self):
-		self.ctl.clear()
-		self.ctl.addItems(self.history)
+		# Swap the history in as one batch without repainting or
+		# announcing the intermediate (empty) states.
+		self.ctl.setUpdatesEnabled(False)
+		old = self.ctl.blockSignals(True)
+		try:
+			self.ctl.clear()
+			self.ctl.addItems(self.history)
+		finally:
+			self.ctl.blockSignals(old)
+			self.ctl.setUpdatesEnabled(True)
 		if self.edit_string in self.history:
 			self.ctl.setCurrentIndex(self.history.index(self.edit_string))
 		else:
@@ -801,21 +1195,27 @@ class StringQuery(FmQuery):
 		'''Add a string to the history.'''
 		if len(self.history) > 0 and self.history[0] == string:
 			return
-		if string in self.history:
+		try:
 			self.history.remove(string)
+		except ValueError:
+			pass
 		r = self.ctl.findText(string)
 		if r >= 0:
 			self.ctl.removeItem(r)
 		self.history.insert(0, string)
 		self.ctl.insertItem(0, string)
-		self.ctl.setCurrentIndex(self.history.index(string))
+		self.ctl.setCurrentIndex(0)
+		if len(self.history) > self.history_size:
+			del self.history[self.history_size:]
+			while self.ctl.count() > self.history_size:
+				self.ctl.removeItem(self.ctl.count() - 1)
 
 	def export_state(self):
-		return {'edit_string': str(self.edit_string), 'history': self.history[:100]}
+		return {'edit_string': str(self.edit_string), 'history': self.history[:self.history_size]}
 
 	def import_state(self, data):
 		self.edit_string = data['edit_string']
-		self.history = data['history']
+		self.history = data['history'][:self.history_size]
 
 	def summarize(self):
 		x = super(StringQuery, self).summarize()
@@ -842,15 +1242,19 @@ class ChecklistQuery(FmQuery):
 		return [{'label': x[0], 'state': x[1]} for x in self.items]
 
 	def import_state(self, data):
+		# Index the items by label once instead of searching the
+		# list for every saved entry; the first item wins.
+		items = {}
+		for i in self.items:
+			items.setdefault(i[0], i)
 		for d in data:
-			for i in self.items:
-				if i[0] == d['label']:
-					i[1] = d['state']
-					break
+			i = items.get(d['label'])
+			if i is not None:
+				i[1] = d['state']
 
 	def summarize(self):
-		x = super(StringQuery, self).summarize()
-		return x + ', '.join([x for x in self.items if x[1]])
+		x = super(ChecklistQuery, self).summarize()
+		return x + ', '.join(i[0] for i in self.items if i[1])
 
 class TimestampQuery(FmQuery):
 	'''Handle queries comprising a range of timestamps.'''
@@ -980,13 +1384,24 @@ class fmgui(QtWidgets.QMainWindow):
 		super(fmgui, self).__init__()
 		self.json_version = 1
 		self.fmdb = fmdbX
+		# Keep the sorts and DISTINCTs behind interactive queries
+		# out of temp files.
+		self.fmdb.conn.execute('PRAGMA temp_store = MEMORY')
 		try:
 			uic.loadUi('%s/filemapper.ui' % os.environ['FM_LIB_DIR'], self)
 		except:
 			uic.loadUi('filemapper.ui', self)
 		self.fs = self.fmdb.query_summary()
+		self.size_units = fmcli.size_units(self.fs)
+		self.summary_parts = None
+		self.summary_text_len = None
+		self.summary_text_cache = None
+		self.query_cache = collections.OrderedDict()
+		self.query_cache_size = 32
+		self.query_cache_rows = 1000000
 		self.setWindowTitle('%s (%s) - FileMapper' % (self.fs.path, self.fs.fstype))
 		self.histfile = histfile
+		self.saved_state = None
 		self.mp = MessagePump(self.mp_start, self.mp_stop)
 
 		# Set up the menu
@@ -1023,6 +1438,14 @@ class fmgui(QtWidgets.QMainWindow):
 		self.ost.timeout.connect(self.run_query)
 		self.old_ostart = None
 		self.old_oend = None
+		# Wait for table selections to settle before highlighting
+		self.pst = QtCore.QTimer()
+		self.pst.setSingleShot(True)
+		self.pst.timeout.connect(self.apply_pick)
+		self.pick_fn = None
+		self.sst = QtCore.QTimer()
+		self.sst.setSingleShot(True)
+		self.sst.timeout.connect(self.save_state)
 
 		# Set up the extent view
 		self.etm = ExtentTableModel(self.fs, [], units)
@@ -1030,22 +1453,34 @@ class fmgui(QtWidgets.QMainWindow):
 		self.extent_table.setModel(self.etm)
 		self.extent_table.selectionModel().selectionChanged.connect(self.pick_extent_table)
 		self.extent_table.sortByColumn(-1, 0) #Qt.AscendingOrder)
+		size_table_columns(self.extent_table, self.etm)
 
 		# Set up the inode view
 		self.itm = InodeTableModel(self.fs, [], units)
 		self.inode_table.setModel(self.itm)
+		size_table_columns(self.inode_table, self.itm)
 		self.inode_table.selectionModel().selectionChanged.connect(self.pick_inode_table)
+		# Keep the result counts current as the tables pull in rows.
+		self.etm.rowsInserted.connect(self.update_query_summary)
+		self.itm.rowsInserted.connect(self.update_query_summary)
 		self.extent_table.sortByColumn(-1, 0)
 
 		# Set up the fs tree view
+		# Remember directory listings so that re-expanding a directory
+		# doesn't go back to the database.  The database sorts the
+		# entries, so big directories are read only as far as the
+		# tree has been scrolled.  Listing by inode number skips
+		# looking up the directory's path.
+		@functools.lru_cache(maxsize = 1024)
+		def ls(dir_ino):
+			return LazyList(self.fmdb.query_dir(dir_ino))
 		de = self.fmdb.query_root()
-		root = FsTreeNode(de.name, de.ino, de.type, \
-				  lambda x: sorted(self.fmdb.query_ls([x]), key = sort_dentry), \
-				  fs = self.fs)
+		root = FsTreeNode(de.name, de.ino, de.type, ls, fs = self.fs)
 
 		self.ftm = FsTreeModel(self.fs, root)
 		self.fs_tree.setModel(self.ftm)
 		self.fs_tree.selectionModel().selectionChanged.connect(self.pick_fs_tree)
+		self.fs_tree.collapsed.connect(self.collapse_fs_tree)
 		self.fs_tree.setRootIsDecorated(False)
 		self.fs_tree.expand(self.ftm.root_index())
 
@@ -1132,11 +1567,12 @@ class fmgui(QtWidgets.QMainWindow):
 
 	def parse_size_ranges(self, args):
 		'''Parse string arguments into size ranges.'''
-		return fmcli.parse_ranges(args, lambda x: fmcli.s2p(self.fs, x))
+		return fmcli.parse_ranges(args, lambda x: fmcli.suffixed_to_int(self.size_units, x))
 
 	def parse_number_ranges(self, args, maximum):
 		'''Parse string arguments into number ranges.'''
-		return fmcli.parse_ranges(args, lambda x: fmcli.n2p(maximum, x))
+		conv = fmcli.number_units(maximum)
+		return fmcli.parse_ranges(args, lambda x: fmcli.suffixed_to_int(conv, x))
 
 	def mp_start(self):
 		'''Disable UI elements during message pumping.'''
@@ -1152,6 +1588,7 @@ class fmgui(QtWidgets.QMainWindow):
 		self.fs_tree.setEnabled(True)
 		self.extent_type_actions.setEnabled(True)
 
+	@QtCore.pyqtSlot()
 	def do_summary(self):
 		'''Load the FS summary into the status line.'''
 		s = self.summary_text()
@@ -1159,6 +1596,22 @@ class fmgui(QtWidgets.QMainWindow):
 
 	def summary_text(self, overview_len = None):
 		'''Summarize the filesystem contents.'''
+		if overview_len is None:
+			overview_len = self.overview.total_length()
+		if self.summary_text_len == overview_len:
+			return self.summary_text_cache
+		if self.summary_parts is None:
+			self.summary_parts = self.summarize_fs()
+		head, tail = self.summary_parts
+		cell = float(self.fs.total_bytes) / overview_len if overview_len else 0
+		s = head + fmcli.format_size(fmcli.units_auto, cell) + tail
+		self.summary_text_len = overview_len
+		self.summary_text_cache = s
+		return s
+
+	def summarize_fs(self):
+		'''Format the parts of the summary that don't depend on the
+		   overview; returns the text before and after the cell size.'''
 		tb = self.fs.total_bytes
 		fb = self.fs.free_bytes
 		if tb == 0:
@@ -1169,26 +1622,24 @@ class fmgui(QtWidgets.QMainWindow):
 		if ti == 0:
 			fi = 1
 			ti = 1
-		if overview_len is None:
-			overview_len = self.overview.total_length()
-		inodes = self.fs.inodes if self.fs.inodes != 0 else 1
 		extents = self.fs.extents if self.fs.extents != 0 else 1
 		extents_blocks = self.fs.extents_bytes / self.fs.block_size if self.fs.extents_bytes != 0 else 1
-		s = "%s of %s (%.0f%%) used; %s of %s (%.0f%%) inodes; %s extents; %s/cell; %.1f%% frag; %s avg. travel" % \
+		head = "%s of %s (%.0f%%) used; %s of %s (%.0f%%) inodes; %s extents; " % \
 			(fmcli.format_size(fmcli.units_auto, self.fs.total_bytes - self.fs.free_bytes), \
 			 fmcli.format_size(fmcli.units_auto, self.fs.total_bytes), \
 			 100 * (1.0 - (float(fb) / tb)), \
 			 fmcli.format_number(fmcli.units_auto, self.fs.total_inodes - self.fs.free_inodes), \
 			 fmcli.format_number(fmcli.units_auto, self.fs.total_inodes), \
 			 100 * (1.0 - (float(fi) / ti)), \
-			 fmcli.format_number(fmcli.units_auto, self.fs.extents), \
-			 fmcli.format_size(fmcli.units_auto, float(self.fs.total_bytes) / overview_len), \
-			 100.0 * extents / extents_blocks, \
+			 fmcli.format_number(fmcli.units_auto, self.fs.extents))
+		tail = "/cell; %.1f%% frag; %s avg. travel" % \
+			(100.0 * extents / extents_blocks, \
 			 fmcli.format_size(fmcli.units_auto, self.fmdb.query_avg_travel_score()))
-		return s
+		return (head, tail)
 
 	## Load and save UI state
 
+	@QtCore.pyqtSlot()
 	def save_state(self):
 		'''Save the state of the UI.'''
 		def eta():
@@ -1220,8 +1671,16 @@ class fmgui(QtWidgets.QMainWindow):
 		for qt in self.query_types:
 			qtdata[qt.label] = qt.export_state()
 		data['query_data'] = qtdata
-		with open(self.histfile, 'w') as fd:
-			json.dump(data, fd, indent = 4)
+		text = json.dumps(data, indent = 4)
+		if text == self.saved_state:
+			return
+		# Write a new file and rename it over the old one, so that
+		# a crash mid-write can't leave a truncated history behind.
+		tmpfile = self.histfile + '.tmp'
+		with open(tmpfile, 'w') as fd:
+			fd.write(text)
+		os.replace(tmpfile, self.histfile)
+		self.saved_state = text
 
 	def load_state(self):
 		'''Load the state of the UI.'''
@@ -1274,58 +1733,66 @@ class fmgui(QtWidgets.QMainWindow):
 	## Load data into models
 
 	def load_extents(self, f):
-		'''Populate the extent table.'''
-		t0 = datetime.datetime.today()
-		if isinstance(f, list):
+		'''Populate the extent table.  Results are pulled from the
+		   query as the table needs them.'''
+		t0 = time.perf_counter()
+		if isinstance(f, LazyList):
 			new_data = f
 		else:
-			n = 0
-			new_data = []
-			for x in f:
-				new_data.append(x)
-				if n > 1000:
-					self.mp.pump()
-					n = 0
-				n += 1
-		t1 = datetime.datetime.today()
+			new_data = LazyList(f, self.mp.pump)
+		t1 = time.perf_counter()
 		self.extent_table.sortByColumn(-1, 0)
-		t2 = datetime.datetime.today()
+		t2 = time.perf_counter()
 		self.etm.revise(new_data)
 		self.actionExportExtents.setEnabled(len(new_data) > 0)
-		t3 = datetime.datetime.today()
-		for x in range(self.etm.columnCount(None)):
-			self.extent_table.resizeColumnToContents(x)
-		t4 = datetime.datetime.today()
+		t3 = time.perf_counter()
+		t4 = time.perf_counter()
 		self.update_query_summary()
-		t5 = datetime.datetime.today()
+		t5 = time.perf_counter()
 		fmdb.print_times('load_extents', [t0, t1, t2, t3, t4, t5])
+		return new_data
 
 	def load_inodes(self, f):
-		'''Populate the inode table.'''
-		t0 = datetime.datetime.today()
-		if isinstance(f, list):
+		'''Populate the inode table.  Results are pulled from the
+		   query as the table needs them.'''
+		t0 = time.perf_counter()
+		if isinstance(f, LazyList):
 			new_data = f
 		else:
-			n = 0
-			new_data = []
-			for x in f:
-				new_data.append(x)
-				if n > 1000:
-					self.mp.pump()
-					n = 0
-				n += 1
-		t1 = datetime.datetime.today()
+			new_data = LazyList(f, self.mp.pump)
+		t1 = time.perf_counter()
 		self.inode_table.sortByColumn(-1, 0)
-		t2 = datetime.datetime.today()
+		t2 = time.perf_counter()
 		self.itm.revise(new_data)
 		self.actionExportInodes.setEnabled(len(new_data) > 0)
-		t3 = datetime.datetime.today()
-		for x in range(self.itm.columnCount(None)):
-			self.inode_table.resizeColumnToContents(x)
-		t4 = datetime.datetime.today()
+		t3 = time.perf_counter()
+		t4 = time.perf_counter()
 		self.update_query_summary()
-		t5 = datetime.datetime.today()
+		t5 = time.perf_counter()
 		fmdb.print_times('load_stats', [t0, t1, t2, t3, t4, t5])
+		return new_data
+
+	def load_query(self, extents_fn, inodes_fn, args):
+		'''Populate the extent and inode tables from a pair of
+		   queries, reusing the results of a recent identical query.'''
+		key = (extents_fn.__name__, args)
+		results = self.query_cache.pop(key, None)
+		if results is None:
+			results = (self.load_extents(extents_fn(args)),
+				   self.load_inodes(inodes_fn(args)))
+		else:
+			self.load_extents(results[0])
+			self.load_inodes(results[1])
+		self.query_cache[key] = results
+		# Results keep growing as they're scrolled, sorted, or
+		# exported, so bound the rows held as well as the number of
+		# queries.  The newest entry is in use anyway, so keep it.
+		rows = sum(len(e) + len(i) for e, i in self.query_cache.values())
+		while len(self.query_cache) > 1 and \
+		      (len(self.query_cache) > self.query_cache_size or \
+		       rows > self.query_cache_rows):
+			k, (e, i) = self.query_cache.popitem(last = False)
+			rows -= len(e) + len(i)
 
 	## Change the overview highlight after selecting some widgets
 
@@ -1337,6 +1804,17 @@ class fmgui(QtWidgets.QMainWindow):
 				self.query_text.setEditText(text)
 				return
 
+	@QtCore.pyqtSlot(QtCore.QModelIndex)
+	def collapse_fs_tree(self, index):
+		'''Free a collapsed directory's nodes, unless we'd lose the
+		   selection by doing so.'''
+		node = index.internalPointer()
+		for m in self.fs_tree.selectedIndexes():
+			if node.is_ancestor_of(m.internalPointer()):
+				return
+		self.ftm.unload(index)
+
+	@QtCore.pyqtSlot('QItemSelection', 'QItemSelection')
 	def pick_fs_tree(self, n, o):
 		'''Handle the selection of a FS tree nodes.'''
 		self.ost.stop()
@@ -1346,7 +1824,9 @@ class fmgui(QtWidgets.QMainWindow):
 		is_meta = (keymod & QtCore.Qt.MetaModifier) != 0
 		for m in self.fs_tree.selectedIndexes():
 			node = m.internalPointer()
-			p = node.path if node.path != '' else self.fs.pathsep
+			p = node.full_path()
+			if p == '':
+				p = self.fs.pathsep
 			if node.hasChildren() and not is_meta:
 				extent_paths.add(p)
 				if ' ' in p:
@@ -1364,41 +1844,48 @@ class fmgui(QtWidgets.QMainWindow):
 
 	def __pick_extents(self):
 		'''Tell the overview to highlight the selected extents.'''
-		t0 = datetime.datetime.today()
-		rows = {m.row() for m in self.extent_table.selectedIndexes()}
+		t0 = time.perf_counter()
+		# One index per selected row, not one per selected cell.
+		rows = [m.row() for m in self.extent_table.selectionModel().selectedRows()]
 		ranges = [(ex.p_off, ex.p_off + ex.length - 1) for ex in self.etm.extents(rows)]
-		t1 = datetime.datetime.today()
+		t1 = time.perf_counter()
 		self.overview.highlight_ranges(ranges)
-		t2 = datetime.datetime.today()
+		t2 = time.perf_counter()
 		fmdb.print_times('pick_ex', [t0, t1, t2])
 
+	@QtCore.pyqtSlot('QItemSelection', 'QItemSelection')
 	def pick_extent_table(self, n, o):
 		'''Handle the selection of extent table rows.'''
-		self.mp.start()
-		try:
-			self.__pick_extents()
-		finally:
-			self.mp.stop()
+		self.pick_fn = self.__pick_extents
+		self.pst.start(50)
 
 	def __pick_inodes(self):
 		'''Tell the overview to highlight the selected inodes' extents.'''
-		t0 = datetime.datetime.today()
-		rows = [m.row() for m in self.inode_table.selectedIndexes()]
+		t0 = time.perf_counter()
+		rows = [m.row() for m in self.inode_table.selectionModel().selectedRows()]
 		inodes = {i.ino for i in self.itm.inodes(rows)}
 		ranges = [(ex.p_off, ex.p_off + ex.length - 1) for ex in self.etm.inodes_extents(inodes)]
-		t1 = datetime.datetime.today()
+		t1 = time.perf_counter()
 		self.overview.highlight_ranges(ranges)
-		t2 = datetime.datetime.today()
+		t2 = time.perf_counter()
 		fmdb.print_times('pick_ex', [t0, t1, t2])
 
+	@QtCore.pyqtSlot('QItemSelection', 'QItemSelection')
 	def pick_inode_table(self, n, o):
 		'''Handle the selection of inode table rows.'''
+		self.pick_fn = self.__pick_inodes
+		self.pst.start(50)
+
+	@QtCore.pyqtSlot()
+	def apply_pick(self):
+		'''Highlight the most recent table selection.'''
 		self.mp.start()
 		try:
-			self.__pick_inodes()
+			self.pick_fn()
 		finally:
 			self.mp.stop()
 
+	@QtCore.pyqtSlot()
 	def select_overview(self):
 		'''Handle the user making a physical block selection in
 		   the overview.'''
@@ -1419,6 +1906,7 @@ class fmgui(QtWidgets.QMainWindow):
 
 	## React to UI changes
 
+	@QtCore.pyqtSlot(int)
 	def change_querytype(self, idx):
 		'''Handle a change in the query type selector.'''
 		if self.old_querytype is not None:
@@ -1428,6 +1916,7 @@ class fmgui(QtWidgets.QMainWindow):
 		new_qt.load_query()
 		self.old_querytype = idx
 
+	@QtCore.pyqtSlot(QtWidgets.QAction)
 	def change_units(self, action):
 		'''Handle one of the units menu items.'''
 		idx = self.unit_actions.index(action)
@@ -1447,6 +1936,7 @@ class fmgui(QtWidgets.QMainWindow):
 			u.setChecked(False)
 		self.unit_actions[idx].setChecked(True)
 
+	@QtCore.pyqtSlot(QtWidgets.QAction)
 	def change_extent_type(self, action):
 		'''Toggle display of an extent type in the overview.'''
 		arg = set()
@@ -1455,8 +1945,10 @@ class fmgui(QtWidgets.QMainWindow):
 			if actions[x].isChecked():
 				arg.add(x)
 		self.fmdb.set_extent_types_to_show(arg)
-		self.overview.render()
+		self.query_cache.clear()
+		self.overview.schedule_render()
 
+	@QtCore.pyqtSlot()
 	def change_font(self):
 		'''Change the overview font.'''
 		y = self.overview_text.document().defaultFont()
@@ -1473,43 +1965,57 @@ class fmgui(QtWidgets.QMainWindow):
 	def closeEvent(self, ev):
 		qt = self.query_types[self.querytype_combo.currentIndex()]
 		qt.save_query()
+		self.sst.stop()
 		self.save_state()
 		super(fmgui, self).closeEvent(ev)
 
+	@QtCore.pyqtSlot(int)
 	def change_zoom(self, idx):
 		'''Handle a change in the zoom selector.'''
 		s = self.zoom_combo.currentText()
 		self.overview.set_zoom(s)
 
+	@QtCore.pyqtSlot()
 	def toggle_heatmap(self):
 		self.overview.heatmap = not self.overview.heatmap
-		self.overview.render()
+		self.overview.schedule_render()
 
 	## Queries
 
+	@QtCore.pyqtSlot()
 	def run_query(self):
 		'''Dispatch a query to populate the extent table.'''
 		self.status_label.setText('Working...')
+		# Queries run on this thread, so paint the label now.
+		self.status_label.repaint()
 		self.ost.stop()
+		self.pst.stop()
 		self.mp.start()
 		idx = self.querytype_combo.currentIndex()
 		qt = self.query_types[idx]
 		try:
 			qt.run_query()
 			self.__pick_extents()
+			self.update_query_summary()
 			# XXX: should we clear the fs tree and extent selection too?
 		finally:
 			self.mp.stop()
-		self.save_state()
+		# Save the query history once a burst of queries is over.
+		self.sst.start(2000)
 		self.do_summary()
 
+	@QtCore.pyqtSlot()
 	def update_query_summary(self):
 		'''Update the query summary text in the UI.'''
 		e = self.etm.extent_count()
 		i = self.itm.inode_count()
-		s = 'Query Results: %s extents; %s inodes' % (
+		s = 'Query Results: %s%s extents; %s%s inodes' % (
 				fmcli.format_number(fmcli.units_none, e),
-				fmcli.format_number(fmcli.units_none, i))
+				'' if self.etm.is_complete() else '+',
+				fmcli.format_number(fmcli.units_none, i),
+				'' if self.itm.is_complete() else '+')
+		if not self.etm.is_complete() or not self.itm.is_complete():
+			s += ' (loading...)'
 		self.results_dock.setWindowTitle(s)
 
 	def query_overview(self, args):
@@ -1521,8 +2027,7 @@ class fmgui(QtWidgets.QMainWindow):
 		ranges = self.parse_number_ranges(args, self.overview.total_length())
 		self.fmdb.set_overview_length(self.overview.total_length())
 		r = list(self.fmdb.pick_cells(ranges))
-		self.load_extents(self.fmdb.query_poff_range(r))
-		self.load_inodes(self.fmdb.query_poff_range_inodes(r))
+		self.load_query(self.fmdb.query_poff_range, self.fmdb.query_poff_range_inodes, tuple(r))
 
 	def query_poff(self, args):
 		'''Query based on ranges of physical bytes.'''
@@ -1531,8 +2036,7 @@ class fmgui(QtWidgets.QMainWindow):
 			self.load_inodes([])
 			return
 		ranges = self.parse_size_ranges(args)
-		self.load_extents(self.fmdb.query_poff_range(ranges))
-		self.load_inodes(self.fmdb.query_poff_range_inodes(ranges))
+		self.load_query(self.fmdb.query_poff_range, self.fmdb.query_poff_range_inodes, tuple(ranges))
 
 	def query_loff(self, args):
 		'''Query based on ranges of logical bytes.'''
@@ -1541,8 +2045,7 @@ class fmgui(QtWidgets.QMainWindow):
 			self.load_inodes([])
 			return
 		ranges = self.parse_size_ranges(args)
-		self.load_extents(self.fmdb.query_loff_range(ranges))
-		self.load_inodes(self.fmdb.query_loff_range_inodes(ranges))
+		self.load_query(self.fmdb.query_loff_range, self.fmdb.query_loff_range_inodes, tuple(ranges))
 
 	def query_inodes(self, args):
 		'''Query based on ranges of inodes.'''
@@ -1551,8 +2054,7 @@ class fmgui(QtWidgets.QMainWindow):
 			self.load_inodes([])
 			return
 		ranges = self.parse_number_ranges(args, self.fs.total_inodes)
-		self.load_extents(self.fmdb.query_inums(ranges))
-		self.load_inodes(self.fmdb.query_inums_inodes(ranges))
+		self.load_query(self.fmdb.query_inums, self.fmdb.query_inums_inodes, tuple(ranges))
 
 	def query_paths(self, args):
 		'''Query based on a list of FS paths.'''
@@ -1560,14 +2062,12 @@ class fmgui(QtWidgets.QMainWindow):
 			self.load_extents([])
 			self.load_inodes([])
 			return
-		self.load_extents(self.fmdb.query_paths(args))
-		self.load_inodes(self.fmdb.query_paths_inodes(args))
+		self.load_query(self.fmdb.query_paths, self.fmdb.query_paths_inodes, tuple(args))
 
 	def query_extent_type(self, args):
 		'''Query based on the extent type code.'''
 		r = [x[2] for x in args if x[1]]
-		self.load_extents(self.fmdb.query_extent_types(r))
-		self.load_inodes(self.fmdb.query_extent_types_inodes(r))
+		self.load_query(self.fmdb.query_extent_types, self.fmdb.query_extent_types_inodes, tuple(r))
 
 	def query_extent_flags(self, args):
 		'''Query based on the extent flag code.'''
@@ -1586,8 +2086,7 @@ class fmgui(QtWidgets.QMainWindow):
 			self.load_inodes([])
 			return
 		ranges = self.parse_size_ranges(args)
-		self.load_extents(self.fmdb.query_lengths(ranges))
-		self.load_inodes(self.fmdb.query_lengths_inodes(ranges))
+		self.load_query(self.fmdb.query_lengths, self.fmdb.query_lengths_inodes, tuple(ranges))
 
 	def query_travel_scores(self, args):
 		'''Query based on ranges of travel scores.'''
@@ -1596,8 +2095,7 @@ class fmgui(QtWidgets.QMainWindow):
 			self.load_inodes([])
 			return
 		ranges = self.parse_size_ranges(args)
-		self.load_extents(self.fmdb.query_travel_scores(ranges))
-		self.load_inodes(self.fmdb.query_travel_scores_inodes(ranges))
+		self.load_query(self.fmdb.query_travel_scores, self.fmdb.query_travel_scores_inodes, tuple(ranges))
 
 	def query_nr_extents(self, args):
 		'''Query based on ranges of primary extent counts.'''
@@ -1606,8 +2104,7 @@ class fmgui(QtWidgets.QMainWindow):
 			self.load_inodes([])
 			return
 		ranges = self.parse_number_ranges(args, 2**64)
-		self.load_extents(self.fmdb.query_nr_extents(ranges))
-		self.load_inodes(self.fmdb.query_nr_extents_inodes(ranges))
+		self.load_query(self.fmdb.query_nr_extents, self.fmdb.query_nr_extents_inodes, tuple(ranges))
 
 	def query_sizes(self, args):
 		'''Query based on ranges of inode sizes.'''
@@ -1616,37 +2113,32 @@ class fmgui(QtWidgets.QMainWindow):
 			self.load_inodes([])
 			return
 		ranges = self.parse_size_ranges(args)
-		self.load_extents(self.fmdb.query_sizes(ranges))
-		self.load_inodes(self.fmdb.query_sizes_inodes(ranges))
+		self.load_query(self.fmdb.query_sizes, self.fmdb.query_sizes_inodes, tuple(ranges))
 
 	def query_mtime(self, args):
 		'''Query based on last data change time.'''
-		self.load_extents(self.fmdb.query_mtimes([args]))
-		self.load_inodes(self.fmdb.query_mtimes_inodes([args]))
+		self.load_query(self.fmdb.query_mtimes, self.fmdb.query_mtimes_inodes, (args,))
 
 	def query_atime(self, args):
 		'''Query based on last access time.'''
-		self.load_extents(self.fmdb.query_atimes([args]))
-		self.load_inodes(self.fmdb.query_atimes_inodes([args]))
+		self.load_query(self.fmdb.query_atimes, self.fmdb.query_atimes_inodes, (args,))
 
 	def query_ctime(self, args):
 		'''Query based on last metadata change time.'''
-		self.load_extents(self.fmdb.query_ctimes([args]))
-		self.load_inodes(self.fmdb.query_ctimes_inodes([args]))
+		self.load_query(self.fmdb.query_ctimes, self.fmdb.query_ctimes_inodes, (args,))
 
 	def query_crtime(self, args):
 		'''Query based on creation time.'''
-		self.load_extents(self.fmdb.query_crtimes([args]))
-		self.load_inodes(self.fmdb.query_crtimes_inodes([args]))
+		self.load_query(self.fmdb.query_crtimes, self.fmdb.query_crtimes_inodes, (args,))
 
 	def query_inode_type(self, args):
 		'''Query based on the inode type code.'''
 		r = [x[2] for x in args if x[1]]
-		self.load_extents(self.fmdb.query_inode_types(r))
-		self.load_inodes(self.fmdb.query_inode_types_inodes(r))
+		self.load_query(self.fmdb.query_inode_types, self.fmdb.query_inode_types_inodes, tuple(r))
 
 	## Export query results
 
+	@QtCore.pyqtSlot()
 	def export_extents(self):
 		'''Export extents to a CSV file.'''
 		fn, fmt = QtWidgets.QFileDialog.getSaveFileName(self, 'Export Extents to CSV', \
@@ -1657,26 +2149,30 @@ class fmgui(QtWidgets.QMainWindow):
 		qt = self.query_types[idx]
 		self.mp.start()
 		try:
-			with open(fn, 'w') as fd:
+			with open(fn, 'w', buffering = 1 << 20) as fd:
 				fd.write('# %s(%s) on %s\n' % (self.fs.path, self.fs.fstype, fmcli.posix_timestamp_str(self.fs.date, True)))
 				fd.write('# %s\n' % self.status_label.text())
 				fd.write('# Query: %s\n' % qt.summarize())
 				fd.write('# Path, Physical Offset, Logical Offset, Length, Flags, Type\n')
-				n = 0
+				# Format a batch of rows at a time and hand each batch
+				# to the file in one write.
+				lines = []
 				for ext in self.etm.extents(None):
-					fd.write('"%s",%d,%s,%d,"%s","%s"\n' % \
+					lines.append('"%s",%d,%s,%d,"%s","%s"\n' % \
 						(ext.path if ext.path != '' else self.fs.pathsep, \
 						 ext.p_off, '' if ext.l_off is None else ext.l_off, \
 						 ext.length, \
 						 fmdb.extent_flagstr(ext), \
 						 fmdb.extent_typestr(ext)))
-					if n > 1000:
+					if len(lines) > 1000:
+						fd.write(''.join(lines))
+						lines = []
 						self.mp.pump()
-						n = 0
-					n += 1
+				fd.write(''.join(lines))
 		finally:
 			self.mp.stop()
 
+	@QtCore.pyqtSlot()
 	def export_inodes(self):
 		'''Export inodes to a CSV file.'''
 		fn, fmt = QtWidgets.QFileDialog.getSaveFileName(self, 'Export Inodes to CSV', \
@@ -1687,17 +2183,17 @@ class fmgui(QtWidgets.QMainWindow):
 		qt = self.query_types[idx]
 		self.mp.start()
 		try:
-			with open(fn, 'w') as fd:
+			with open(fn, 'w', buffering = 1 << 20) as fd:
 				fd.write('# %s(%s) on %s\n' % (self.fs.path, self.fs.fstype, fmcli.posix_timestamp_str(self.fs.date, True)))
 				fd.write('# %s\n' % self.status_label.text())
 				fd.write('# Query: %s\n' % qt.summarize())
 				fd.write('# Inode, Number of Extents, Travel Score, Type, Size, Last Access, Creation, Last Metadata Change, Last Data Change, Paths\n')
-				n = 0
+				lines = []
 				for inode in self.itm.inodes(None):
 					ts = '' if inode.travel_score is None else '%.02f' % inode.travel_score
 					nr = '' if inode.nr_extents is None else '%d' % inode.nr_extents
 					iss = '' if inode.size is None else inode.size
-					fd.write('%d,%s,%s,"%s",%s,%s,%s,%s,%s,"%s"\n' % \
+					lines.append('%d,%s,%s,"%s",%s,%s,%s,%s,%s,"%s"\n' % \
 						(inode.ino, nr, ts, \
 						 fmdb.inode_typestr(inode), \
 						 iss, \
@@ -1706,13 +2202,15 @@ class fmgui(QtWidgets.QMainWindow):
 						 fmcli.posix_timestamp_str(inode.ctime), \
 						 fmcli.posix_timestamp_str(inode.mtime), \
 						 inode.path))
-					if n > 1000:
+					if len(lines) > 1000:
+						fd.write(''.join(lines))
+						lines = []
 						self.mp.pump()
-						n = 0
-					n += 1
+				fd.write(''.join(lines))
 		finally:
 			self.mp.stop()
 
+	@QtCore.pyqtSlot()
 	def export_overview(self):
 		'''Export overview to a HTML file.'''
 		fn, fmt = QtWidgets.QFileDialog.getSaveFileName(self, 'Export Overview to HTML', \